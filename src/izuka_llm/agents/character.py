@@ -1,12 +1,16 @@
+import asyncio
 import os
-from typing import TypedDict, Annotated, Sequence
-import operator
+
+import httpx
+from typing import TypedDict, Annotated
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
-from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
-from langgraph.prebuilt import ToolExecutor
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph.message import add_messages
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from izuka_llm.toolkits.search import make_tavily_search
 
 # --- 1. 设置 API 密钥 ---
 # 为了安全，建议从环境变量读取
@@ -14,69 +18,29 @@ from langgraph.checkpoint.memory import MemorySaver
 # os.environ["TAVILY_API_KEY"] = "tvly-..."
 
 # 如果没有设置环境变量，可以在这里手动设置（不推荐在生产环境中这样做）
-try:
-    from getpass import getpass
+def _ensure_api_keys():
+    try:
+        from getpass import getpass
+
+        if "OPENAI_API_KEY" not in os.environ:
+            os.environ["OPENAI_API_KEY"] = getpass("Enter your OpenAI API key: ")
+        if "TAVILY_API_KEY" not in os.environ:
+            os.environ["TAVILY_API_KEY"] = getpass("Enter your Tavily API key: ")
+    except Exception as e:
+        print(f"Error setting API keys: {e}")
+        exit()
 
-    if "OPENAI_API_KEY" not in os.environ:
-        os.environ["OPENAI_API_KEY"] = getpass("Enter your OpenAI API key: ")
-    if "TAVILY_API_KEY" not in os.environ:
-        os.environ["TAVILY_API_KEY"] = getpass("Enter your Tavily API key: ")
-except Exception as e:
-    print(f"Error setting API keys: {e}")
-    exit()
 
+CHECKPOINT_DB = os.environ.get("CHECKPOINT_DB", "checkpoints.db")
+
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+_HTTP_TIMEOUT = 30.0
 
 
 # --- 3. 定义图的状态 ---
 # 状态将在图的节点之间传递
 class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], operator.add]
-
-
-# --- 4. 定义模型和工具执行器 ---
-# 我们使用 ChatOpenAI 模型
-model = ChatOpenAI(model="gpt-4o", temperature=0)
-# 将工具绑定到模型上，这样模型就知道如何调用它们
-model = model.bind_tools(tools)
-# 创建一个工具执行器，用于实际运行工具
-tool_executor = ToolExecutor(tools)
-
-
-# --- 5. 定义图的节点 ---
-
-# 节点1: Agent (负责思考和决定行动)
-def agent_node(state: AgentState):
-    messages = state["messages"]
-    response = model.invoke(messages)
-    return {"messages": [response]}
-
-
-# 节点2: Tools (负责执行工具)
-def tools_node(state: AgentState):
-    messages = state["messages"]
-    # 获取最后一条AI消息，其中应包含工具调用
-    last_message = messages[-1]
-    # 执行工具调用
-    tool_outputs = tool_executor.batch(last_message.tool_calls, return_exceptions=True)
-
-    # 创建工具消息
-    tool_messages = []
-    for output, tool_call in zip(tool_outputs, last_message.tool_calls):
-        if isinstance(output, BaseException):
-            tool_messages.append(
-                ToolMessage(
-                    content=f"Error: {repr(output)}",
-                    tool_call_id=tool_call["id"],
-                )
-            )
-        else:
-            tool_messages.append(
-                ToolMessage(
-                    content=str(output),
-                    tool_call_id=tool_call["id"],
-                )
-            )
-    return {"messages": tool_messages}
+    messages: Annotated[list[BaseMessage], add_messages]
 
 
 # --- 6. 定义图的边（逻辑流程） ---
@@ -93,65 +57,137 @@ def should_continue(state: AgentState):
     return END
 
 
-# --- 7. 构建图 ---
-# 定义一个新的图
-workflow = StateGraph(AgentState)
+# 模型初始化与图的编译都有较大开销，放在函数中按需构建，避免导入本模块时产生副作用
+def _build_app(checkpointer: BaseCheckpointSaver, http_client: httpx.AsyncClient):
+    # --- 2. 定义工具 ---
+    # 使用 Tavily 进行网络搜索，与模型共用同一个连接池
+    tools = [make_tavily_search(http_client)]
+    tools_by_name = {t.name: t for t in tools}
+
+    # --- 4. 定义模型和工具执行器 ---
+    # 我们使用 ChatOpenAI 模型，复用调用方传入的 HTTP/2 长连接池，避免每次调用都重新握手
+    model = ChatOpenAI(model="gpt-4o", temperature=0, http_async_client=http_client)
+    # 将工具绑定到模型上，这样模型就知道如何调用它们
+    model = model.bind_tools(tools)
+
+    # 执行单个工具调用，找不到工具时抛出的异常与工具本身的异常一样会被转成错误消息
+    async def run_tool(tool_call: dict):
+        return await tools_by_name[tool_call["name"]].ainvoke(tool_call["args"])
+
+    # --- 5. 定义图的节点 ---
+
+    # 节点1: Agent (负责思考和决定行动)
+    async def agent_node(state: AgentState):
+        messages = state["messages"]
+        response = await model.ainvoke(messages)
+        return {"messages": [response]}
+
+    # 节点2: Tools (负责执行工具)
+    # 工具调用多为 I/O 密集型，异步并发执行可以让多个工具调用的网络等待相互重叠
+    async def tools_node(state: AgentState):
+        messages = state["messages"]
+        # 获取最后一条AI消息，其中应包含工具调用
+        last_message = messages[-1]
+        # 执行工具调用
+        tool_outputs = await asyncio.gather(
+            *(run_tool(tool_call) for tool_call in last_message.tool_calls),
+            return_exceptions=True,
+        )
+
+        # 创建工具消息
+        tool_messages = []
+        for output, tool_call in zip(tool_outputs, last_message.tool_calls):
+            if isinstance(output, BaseException):
+                tool_messages.append(
+                    ToolMessage(
+                        content=f"Error: {repr(output)}",
+                        tool_call_id=tool_call["id"],
+                    )
+                )
+            else:
+                tool_messages.append(
+                    ToolMessage(
+                        content=str(output),
+                        tool_call_id=tool_call["id"],
+                    )
+                )
+        return {"messages": tool_messages}
+
+    # --- 7. 构建图 ---
+    # 定义一个新的图
+    workflow = StateGraph(AgentState)
+
+    # 添加节点
+    workflow.add_node("agent", agent_node)
+    workflow.add_node("tools", tools_node)
+
+    # 设置入口点
+    workflow.set_entry_point("agent")
 
-# 添加节点
-workflow.add_node("agent", agent_node)
-workflow.add_node("tools", tools_node)
+    # 添加条件边
+    workflow.add_conditional_edges(
+        "agent",
+        should_continue,
+        {
+            "tools": "tools",
+            END: END,
+        },
+    )
 
-# 设置入口点
-workflow.set_entry_point("agent")
+    # 添加从'tools'节点回到'agent'节点的普通边
+    # 这样，工具执行完后，AI可以再次思考
+    workflow.add_edge("tools", "agent")
 
-# 添加条件边
-workflow.add_conditional_edges(
-    "agent",
-    should_continue,
-    {
-        "tools": "tools",
-        "END": END,
-    },
-)
+    # 编译图
+    # checkpointer 用于在多次运行之间保存状态（可选，但推荐）
+    app = workflow.compile(checkpointer=checkpointer, interrupt_before=["tools"])
 
-# 添加从'tools'节点回到'agent'节点的普通边
-# 这样，工具执行完后，AI可以再次思考
-workflow.add_edge("tools", "agent")
+    return app
 
-# 编译图
-# MemorySaver 用于在多次运行之间保存状态（可选，但推荐）
-memory = MemorySaver()
-app = workflow.compile(checkpointer=memory, interrupt_before=["tools"])
 
 # --- 8. 运行图 ---
-if __name__ == "__main__":
-    initial_messages = [HumanMessage(content="旧金山市现任市长的名字是什么？他/她的任期是从哪一年开始的？")]
-
-    # 使用一个线程ID来保存对话历史
-    thread = {"configurable": {"thread_id": "1"}}
-
-    print("--- 开始运行 ReAct 智能体 ---")
-
-    # 流式输出，观察每一步
-    for event in app.stream({"messages": initial_messages}, thread):
-        for node_name, node_output in event.items():
-            print(f"--- 节点: {node_name} ---")
-            # 打印该节点产生的最后一条消息
-            last_message = node_output["messages"][-1]
-            if isinstance(last_message, AIMessage):
-                if last_message.tool_calls:
-                    print(f"AI 思考结果: 决定调用工具")
-                    for tool_call in last_message.tool_calls:
-                        print(f"  - 工具: {tool_call['name']}")
-                        print(f"  - 参数: {tool_call['args']}")
-                else:
-                    print(f"AI 最终回答: {last_message.content}")
-            elif isinstance(last_message, ToolMessage):
-                print(f"工具执行结果: {last_message.content[:200]}...")  # 只打印前200个字符
-        print("-" * 20)
-
-    print("\n--- 最终对话历史 ---")
-    final_state = app.get_state(thread)
-    for message in final_state.values["messages"]:
-        message.pretty_print()
+# 图中包含异步节点，需要通过 astream 在事件循环中运行
+async def _run():
+    _ensure_api_keys()
+
+    # 检查点持久化到 SQLite，多个进程之间可以共享，内存占用也不会随会话无限增长
+    # 连接池随 _run 退出一并关闭
+    async with (
+        AsyncSqliteSaver.from_conn_string(CHECKPOINT_DB) as memory,
+        httpx.AsyncClient(http2=True, limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT) as http_client,
+    ):
+        app = _build_app(memory, http_client)
+
+        initial_messages = [HumanMessage(content="旧金山市现任市长的名字是什么？他/她的任期是从哪一年开始的？")]
+
+        # 使用一个线程ID来保存对话历史
+        thread = {"configurable": {"thread_id": "1"}}
+
+        print("--- 开始运行 ReAct 智能体 ---")
+
+        # 流式输出，观察每一步
+        async for event in app.astream({"messages": initial_messages}, thread):
+            for node_name, node_output in event.items():
+                print(f"--- 节点: {node_name} ---")
+                # 打印该节点产生的最后一条消息
+                last_message = node_output["messages"][-1]
+                if isinstance(last_message, AIMessage):
+                    if last_message.tool_calls:
+                        print(f"AI 思考结果: 决定调用工具")
+                        for tool_call in last_message.tool_calls:
+                            print(f"  - 工具: {tool_call['name']}")
+                            print(f"  - 参数: {tool_call['args']}")
+                    else:
+                        print(f"AI 最终回答: {last_message.content}")
+                elif isinstance(last_message, ToolMessage):
+                    print(f"工具执行结果: {last_message.content[:200]}...")  # 只打印前200个字符
+            print("-" * 20)
+
+        print("\n--- 最终对话历史 ---")
+        final_state = await app.aget_state(thread)
+        for message in final_state.values["messages"]:
+            message.pretty_print()
+
 
+if __name__ == "__main__":
+    asyncio.run(_run())
@@ -1,29 +1,88 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
+from loguru import logger
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from izuka_llm.app import openai_compatable
+from izuka_llm.schemas.dto import refresh_current_time, stop_refreshing_current_time
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+
+_CLOCK_INTERVAL = 0.25
+_ENCODING_LOAD_TIMEOUT = 10.0
+
+
+async def _tick_clock():
+    """定期刷新响应中 created 字段使用的时间，误差不超过一个刷新间隔"""
+    try:
+        while True:
+            refresh_current_time()
+            await asyncio.sleep(_CLOCK_INTERVAL)
+    finally:
+        # 任务结束后 current_time() 回退为直接读取系统时间
+        stop_refreshing_current_time()
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # 加载向量模型可能涉及下载与 torch 导入，放到线程池中执行，避免阻塞事件循环
+    await run_in_threadpool(openai_compatable.init_semantic_cache)
+    # 下载编码表没有超时控制，超时后不再等待，加载线程完成后计数自动切换为 token 数
+    try:
+        await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(None, openai_compatable.load_encoding),
+            timeout=_ENCODING_LOAD_TIMEOUT,
+        )
+    except TimeoutError:
+        logger.warning("tiktoken encoding is still loading, counting characters until it is ready")
+    clock_task = asyncio.create_task(_tick_clock())
+    try:
+        yield
+    finally:
+        clock_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await clock_task
 
-for router in [openai_compatable]:
-    app.include_router(router.router)
 
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
-origins = [
+# 新增的路由在这里逐个显式注册
+app.include_router(openai_compatable.router, tags=["openai"])
+
+
+origins = (
     "http://localhost.tiangolo.com",
     "https://localhost.tiangolo.com",
     "http://localhost",
     "http://localhost:8080",
-]
+)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
-    allow_methods=["*"],
+    # 只放行实际用到的方法
+    allow_methods=("GET", "POST", "OPTIONS"),
+    # OpenAI SDK 在浏览器中会发送 x-stainless-* 等自定义请求头，这里不做限制
     allow_headers=["*"],
 )
 
+# 压缩响应体，较小的响应压缩收益不大，直接跳过
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
 
 if __name__ == "__main__":
     from uvicorn import run
-    run(app=app, host="0.0.0.0", port=8080)
+    # 多 worker 模式下 uvicorn 需要以导入字符串的形式传入应用
+    # loop="auto" 在安装了 uvloop 时使用 uvloop（Windows 上不安装，回退到 asyncio）
+    run(
+        app="izuka_llm.app.api:app",
+        host="0.0.0.0",
+        port=8080,
+        loop="auto",
+        http="httptools",
+        workers=os.cpu_count(),
+    )
@@ -1,50 +1,132 @@
-from typing import List, Dict
-from loguru import logger
-from fastapi import APIRouter, HTTPException
+import asyncio
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional
 
+import orjson
+import tiktoken
+from loguru import logger
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+
+from izuka_llm.cache.exact import ExactCache
+from izuka_llm.cache.semantic import SemanticCache
+from izuka_llm.config.config import CacheSettingsEntity
 from izuka_llm.schemas.dto import ModelList, ModelInfo, ChatCompletionResponse, ChatCompletionRequest, ChatMessage, \
-    ChatChoice, UsageInfo
+    ChatChoice, UsageInfo, new_completion_id, current_time
 
 router = APIRouter(prefix="/v1")
 
+cache_settings = CacheSettingsEntity()
+exact_cache = ExactCache(maxsize=cache_settings.exact_cache_maxsize)
+# 向量模型加载较慢且可能需要下载，由应用启动时在线程池中调用 init_semantic_cache 创建
+_semantic_cache: Optional[SemanticCache] = None
+
+
+def init_semantic_cache() -> None:
+    """创建语义缓存，未启用或加载失败时保持为 None，请求将跳过语义缓存"""
+    global _semantic_cache
+    if not cache_settings.semantic_cache_enabled or _semantic_cache is not None:
+        return
+    try:
+        _semantic_cache = SemanticCache(
+            model_name=cache_settings.semantic_cache_model,
+            threshold=cache_settings.semantic_cache_threshold,
+            max_entries=cache_settings.semantic_cache_max_entries,
+            ttl_seconds=cache_settings.semantic_cache_ttl_seconds,
+        )
+    except Exception as e:
+        logger.warning(f"semantic cache disabled, failed to initialize: {e!r}")
+
 
 # --- 3. 核心 LLM 逻辑 ---
 # 这里我们用一个简单的函数来模拟大语言模型的调用。
 # 在真实场景中，这里会调用你的模型推理代码。
 
-def fake_llm_call(messages: List[Dict[str, str]]) -> str:
+def get_last_user_message(messages: List[ChatMessage]) -> str:
+    """找到最后一条用户消息，没有时返回空字符串"""
+    for msg in reversed(messages):
+        if msg.role == "user":
+            return msg.content
+    return ""
+
+
+# 编码表首次使用需要从网络下载（离线部署可通过 TIKTOKEN_CACHE_DIR 预置），
+# 由应用启动时在线程池中调用 load_encoding 加载；加载完成前或加载失败时按字符数计数
+_encoding: Optional[tiktoken.Encoding] = None
+
+# 只缓存较短的文本，避免缓存长期持有大段用户消息
+_TOK_CACHE_MAX_CHARS = 2048
+
+
+def load_encoding() -> None:
+    global _encoding
+    try:
+        _encoding = tiktoken.encoding_for_model("gpt-4o")
+    except Exception as e:
+        logger.warning(f"failed to load tiktoken encoding, counting characters instead: {e!r}")
+
+
+@lru_cache(maxsize=4096)
+def _cached_tok_len(text: str) -> int:
+    return len(_encoding.encode(text))
+
+
+def _tok_len(text: str) -> int:
+    """计算文本的 token 数，重复出现的较短内容（如系统提示词）只编码一次"""
+    if _encoding is None:
+        return len(text)
+    if len(text) > _TOK_CACHE_MAX_CHARS:
+        return len(_encoding.encode(text))
+    return _cached_tok_len(text)
+
+
+def count_prompt_tokens(messages: List[ChatMessage]) -> int:
+    return sum(_tok_len(msg.content) for msg in messages)
+
+
+def fake_llm_call(messages: List[ChatMessage]) -> tuple[str, int]:
     """
     一个模拟的 LLM 调用函数。
     它会获取最后一条用户消息，并生成一个模拟的回复。
+    返回 (回复内容, 提示词 token 数)，两者在同一次遍历中得到。
     """
-    # 找到最后一条用户消息
+    prompt_tokens = 0
     last_user_message = ""
+    found = False
     for msg in reversed(messages):
-        if msg["role"] == "user":
-            last_user_message = msg["content"]
-            break
+        prompt_tokens += _tok_len(msg.content)
+        if not found and msg.role == "user":
+            last_user_message = msg.content
+            found = True
 
     # 生成模拟回复
     if not last_user_message:
-        return "你好！有什么可以帮助你的吗？"
-    return f"这是一个模拟回复，针对你的问题：'{last_user_message}'。"
+        return "你好！有什么可以帮助你的吗？", prompt_tokens
+    return f"这是一个模拟回复，针对你的问题：'{last_user_message}'。", prompt_tokens
 
 
 # --- 4. API 端点实现 ---
 
+# 在这里可以定义你希望暴露给客户端的模型列表
+_MODEL_IDS = ("gpt-3.5-turbo", "gpt-4", "custom-local-model")
+_SUPPORTED_MODELS = frozenset(_MODEL_IDS)
+
+# 模型列表是静态的，导入时构建并序列化一次即可
+_MODEL_LIST = ModelList(data=[ModelInfo(id=i) for i in _MODEL_IDS])
+_MODEL_LIST_JSON = orjson.dumps(_MODEL_LIST.model_dump(mode="json"))
+
+_RESP_ADAPTER = TypeAdapter(ChatCompletionResponse)
+
+
 @router.get("/models", response_model=ModelList)
 async def list_models():
     """
     列出所有可用的模型。
     这模仿了 OpenAI 的 `/v1/models` 端点。
     """
-    # 在这里可以定义你希望暴露给客户端的模型列表
-    available_models = [
-        ModelInfo(id="gpt-3.5-turbo"),
-        ModelInfo(id="gpt-4"),
-        ModelInfo(id="custom-local-model"),
-    ]
-    return ModelList(data=available_models)
+    return Response(content=_MODEL_LIST_JSON, media_type="application/json")
 
 
 @router.post("/chat/completions", response_model=ChatCompletionResponse)
@@ -54,36 +136,112 @@ async def create_chat_completion(request: ChatCompletionRequest):
     这模仿了 OpenAI 的 `/v1/chat/completions` 端点。
     """
     # 检查请求的模型是否在我们的支持列表中
-    supported_models = ["gpt-3.5-turbo", "gpt-4", "custom-local-model"]
-    if request.model not in supported_models:
+    if request.model not in _SUPPORTED_MODELS:
         raise HTTPException(status_code=400, detail=f"Model '{request.model}' not found.")
 
-    # 将 Pydantic 模型转换为字典，方便传递给 LLM 函数
-    messages_dict = [msg.model_dump() for msg in request.messages]
-
-    # 调用我们的模拟 LLM
-    assistant_response_content = fake_llm_call(messages_dict)
-
-    # 构建符合 OpenAI 格式的响应
-    assistant_message = ChatMessage(role="assistant", content=assistant_response_content)
-    choice = ChatChoice(index=0, message=assistant_message)
+    # 仅对低温度请求启用缓存
+    use_cache = request.temperature is not None and request.temperature < cache_settings.cache_max_temperature
+
+    # 精确匹配缓存：重试、刷新等场景会发送完全相同的历史，命中时直接返回已序列化的响应
+    # 缓存的是完整的 JSON 响应，流式请求不适用
+    exact_key = None
+    if use_cache and not request.stream:
+        exact_key = ExactCache.make_key(request)
+        cached_json = exact_cache.get(exact_key)
+        if cached_json is not None:
+            return Response(content=cached_json, media_type="application/json")
+
+    # 语义缓存：按最后一条用户消息做相似度检索，命中则跳过模型推理
+    embedding = None
+    semantic_cache = _semantic_cache
+    if use_cache and semantic_cache is not None:
+        system_key = SemanticCache.make_system_key(request.messages)
+        embedding = await run_in_threadpool(semantic_cache.embed, get_last_user_message(request.messages))
+        cached = await run_in_threadpool(semantic_cache.lookup, embedding, request.model, system_key)
+        if cached is not None:
+            logger.opt(lazy=True).debug("semantic cache hit, similarity={:.4f}", lambda: cached.similarity)
+            if request.stream:
+                return build_streaming_response(request.model, cached.content)
+            # 缓存的回复来自另一段对话，token 使用情况按当前请求重新计算
+            response = build_chat_completion(request.model, cached.content, count_prompt_tokens(request.messages))
+            response_json = _RESP_ADAPTER.dump_json(response)
+            if exact_key is not None:
+                exact_cache.set(exact_key, response_json)
+            return Response(content=response_json, media_type="application/json")
+
+    # 调用我们的模拟 LLM，同时得到 token 使用情况
+    assistant_response_content, prompt_tokens = fake_llm_call(request.messages)
+
+    if embedding is not None:
+        await run_in_threadpool(
+            semantic_cache.insert, embedding, assistant_response_content, request.model, system_key
+        )
+
+    if request.stream:
+        return build_streaming_response(request.model, assistant_response_content)
+
+    response = build_chat_completion(request.model, assistant_response_content, prompt_tokens)
+    response_json = _RESP_ADAPTER.dump_json(response)
+    if exact_key is not None:
+        exact_cache.set(exact_key, response_json)
+    logger.opt(lazy=True).debug("chat.completion id={} model={}", lambda: response.id, lambda: request.model)
+    return Response(content=response_json, media_type="application/json")
+
+
+def build_chat_completion(model: str, assistant_response_content: str, prompt_tokens: int) -> ChatCompletionResponse:
+    """
+    构建符合 OpenAI 格式的响应，每次调用都会生成新的 id 与 created。
+    数据均由服务端生成，使用 model_construct 跳过校验。
+    """
+    assistant_message = ChatMessage.model_construct(role="assistant", content=assistant_response_content)
+    choice = ChatChoice.model_construct(index=0, message=assistant_message, finish_reason="stop")
 
-    # 模拟 token 使用情况
-    prompt_tokens = sum(len(msg['content']) for msg in messages_dict)
-    completion_tokens = len(assistant_response_content)
-    usage = UsageInfo(
+    completion_tokens = _tok_len(assistant_response_content)
+    usage = UsageInfo.model_construct(
         prompt_tokens=prompt_tokens,
         completion_tokens=completion_tokens,
         total_tokens=prompt_tokens + completion_tokens
     )
 
-    response = ChatCompletionResponse(
-        model=request.model,
+    return ChatCompletionResponse.model_construct(
+        model=model,
         choices=[choice],
         usage=usage
     )
-    logger.debug(response)
-    return response
+
+
+_SSE_CHUNK_SIZE = 20
+
+
+async def _sse_iter(assistant_response_content: str, model: str) -> AsyncIterator[bytes]:
+    """
+    按 OpenAI 的流式格式逐块输出回复：
+    首块携带 role，随后按固定长度切分 content，最后输出 finish_reason 与 [DONE]。
+    """
+    completion_id = new_completion_id()
+    created = current_time()
+
+    def chunk(delta: dict, finish_reason: Optional[str] = None) -> bytes:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    for i in range(0, len(assistant_response_content), _SSE_CHUNK_SIZE):
+        yield chunk({"content": assistant_response_content[i:i + _SSE_CHUNK_SIZE]})
+        # 让出事件循环，使每一块都能及时发送给客户端
+        await asyncio.sleep(0)
+    yield chunk({}, finish_reason="stop")
+    yield b"data: [DONE]\n\n"
+
+
+def build_streaming_response(model: str, assistant_response_content: str) -> StreamingResponse:
+    return StreamingResponse(_sse_iter(assistant_response_content, model), media_type="text/event-stream")
 
 
 # 您原始的 `/model` 端点可以被保留或删除。
@@ -0,0 +1,28 @@
+from typing import Optional
+
+import blake3
+import orjson
+from cachetools import LRUCache
+
+from izuka_llm.schemas.dto import ChatCompletionRequest
+
+
+class ExactCache:
+    """
+    精确匹配缓存：以完整消息历史、模型、温度与最大输出长度的 blake3 摘要为键，
+    保存已序列化好的响应 JSON，命中时可直接返回，无需向量化与重新校验。
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self._cache: LRUCache[bytes, bytes] = LRUCache(maxsize=maxsize)
+
+    @staticmethod
+    def make_key(request: ChatCompletionRequest) -> bytes:
+        payload = [(m.role, m.content) for m in request.messages] + [request.model, request.temperature, request.max_tokens]
+        return blake3.blake3(orjson.dumps(payload)).digest()
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    def set(self, key: bytes, response_json: bytes) -> None:
+        self._cache[key] = response_json
@@ -0,0 +1,105 @@
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Optional
+
+import blake3
+import orjson
+
+from izuka_llm.schemas.dto import ChatMessage
+
+
+@dataclass
+class CachedCompletion:
+    content: str
+    model: str
+    similarity: float
+
+
+class SemanticCache:
+    """
+    语义缓存：对最后一条用户消息做向量化，用近似最近邻检索历史回复。
+    相似度（余弦）不低于阈值时直接复用缓存的回复，跳过模型推理。
+    只在模型与系统提示词都相同的条目中检索，不同人设/指令下的回复不会互相命中。
+    条目数超过 max_entries 时淘汰最早写入的条目，超过 ttl_seconds 的条目视为未命中。
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        threshold: float,
+        max_entries: int,
+        ttl_seconds: float,
+        collection_name: str = "chat_completions",
+    ):
+        # 依赖 torch，体积较大，只在真正启用语义缓存时才导入
+        import chromadb
+        from sentence_transformers import SentenceTransformer
+
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._embedder = SentenceTransformer(model_name)
+        self._collection = chromadb.EphemeralClient().get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"},
+        )
+        # 按写入顺序记录 (条目 id, 写入时间)，用于淘汰
+        self._entries: deque[tuple[str, float]] = deque()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_system_key(messages: List[ChatMessage]) -> str:
+        """系统消息的 blake3 摘要，作为检索时的过滤条件"""
+        payload = [m.content for m in messages if m.role == "system"]
+        return blake3.blake3(orjson.dumps(payload)).hexdigest()
+
+    def embed(self, text: str) -> list[float]:
+        return self._embedder.encode(text, normalize_embeddings=True).tolist()
+
+    def lookup(self, embedding: list[float], model: str, system_key: str) -> Optional[CachedCompletion]:
+        """查询 top-1 结果，未命中、相似度低于阈值或已过期时返回 None"""
+        result = self._collection.query(
+            query_embeddings=[embedding],
+            n_results=1,
+            where={"$and": [{"model": model}, {"system_key": system_key}]},
+        )
+        if not result["ids"][0]:
+            return None
+
+        metadata = result["metadatas"][0][0]
+        if time.time() - metadata["created_at"] > self.ttl_seconds:
+            return None
+
+        # chroma 的 cosine 空间返回的是距离 (1 - 相似度)
+        similarity = 1.0 - result["distances"][0][0]
+        if similarity < self.threshold:
+            return None
+
+        return CachedCompletion(
+            content=metadata["content"],
+            model=metadata["model"],
+            similarity=similarity,
+        )
+
+    def insert(self, embedding: list[float], content: str, model: str, system_key: str) -> None:
+        entry_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._collection.add(
+                ids=[entry_id],
+                embeddings=[embedding],
+                metadatas=[{"content": content, "model": model, "system_key": system_key, "created_at": now}],
+            )
+            self._entries.append((entry_id, now))
+
+            # 过期的条目不会再命中，与超出容量的条目一并删除
+            evicted = []
+            while self._entries and (
+                len(self._entries) > self.max_entries or now - self._entries[0][1] > self.ttl_seconds
+            ):
+                evicted.append(self._entries.popleft()[0])
+            if evicted:
+                self._collection.delete(ids=evicted)
@@ -11,3 +11,16 @@ class SettingsEntity(BaseSettings):
     s3_endpoint: AnyHttpUrl
     S3_access_key: str
     s3_secret_key: str
+
+
+class CacheSettingsEntity(BaseSettings):
+    # 缓存相关配置均有默认值，未配置外部服务时也能直接实例化
+    exact_cache_maxsize: int = 4096
+    # 语义缓存需要加载向量模型（依赖 torch），默认关闭；启用前需安装 izuka-llm[semantic]
+    semantic_cache_enabled: bool = False
+    semantic_cache_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    semantic_cache_threshold: float = 0.92
+    semantic_cache_max_entries: int = 10000
+    semantic_cache_ttl_seconds: float = 3600
+    # 仅对低温度请求启用缓存，高温度请求本就期望多样化的回复
+    cache_max_temperature: float = 0.3
@@ -1,10 +1,59 @@
+import itertools
+import os
+import secrets
 import time
-import uuid
 from typing import List, Literal, Optional, Dict, Any
 
 
 from pydantic import BaseModel, Field
 
+
+# 进程唯一前缀 + 自增计数器，同一进程内不会重复，且无需每次都读取系统随机数
+_COMPLETION_ID_PREFIX = secrets.token_hex(6)
+_COMPLETION_ID_COUNTER = itertools.count()
+
+
+def _reseed_completion_id() -> None:
+    # 导入后再 fork 出的子进程（如 gunicorn --preload）会继承父进程的前缀与计数器，需要重新生成
+    global _COMPLETION_ID_PREFIX, _COMPLETION_ID_COUNTER
+    _COMPLETION_ID_PREFIX = secrets.token_hex(6)
+    _COMPLETION_ID_COUNTER = itertools.count()
+
+
+def new_completion_id() -> str:
+    # noinspection SpellCheckingInspection
+    return f"chatcmpl-{_COMPLETION_ID_PREFIX}{next(_COMPLETION_ID_COUNTER):x}"
+
+
+# 由应用在后台定期刷新的当前时间（秒），避免每次构造响应都调用 time.time()
+_NOW = int(time.time())
+# 只有后台刷新任务在运行时才使用缓存的时间，否则（如未启动 lifespan 或在其他模块中使用）直接读取系统时间
+_NOW_REFRESHING = False
+
+
+def current_time() -> int:
+    if _NOW_REFRESHING:
+        return _NOW
+    return int(time.time())
+
+
+def refresh_current_time() -> None:
+    global _NOW, _NOW_REFRESHING
+    _NOW = int(time.time())
+    _NOW_REFRESHING = True
+
+
+def stop_refreshing_current_time() -> None:
+    global _NOW_REFRESHING
+    _NOW_REFRESHING = False
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reseed_completion_id)
+    # 刷新任务不会随 fork 带到子进程中
+    os.register_at_fork(after_in_child=stop_refreshing_current_time)
+
+
 class ChatMessage(BaseModel):
     role: Literal["system", "user", "assistant"]
     content: str
@@ -15,7 +64,8 @@ class ChatCompletionRequest(BaseModel):
     messages: List[ChatMessage]
     temperature: Optional[float] = 0.7
     max_tokens: Optional[int] = 1024
-    # 可以根据需要添加更多 OpenAI 支持的参数，如 top_p, stream 等
+    stream: Optional[bool] = False
+    # 可以根据需要添加更多 OpenAI 支持的参数，如 top_p 等
 
 
 class UsageInfo(BaseModel):
@@ -31,10 +81,9 @@ class ChatChoice(BaseModel):
 
 
 class ChatCompletionResponse(BaseModel):
-    # noinspection SpellCheckingInspection
-    id: str = Field(default_factory=lambda: f"chatcmpl-{uuid.uuid4().hex}")
+    id: str = Field(default_factory=new_completion_id)
     object: str = "chat.completion"
-    created: int = Field(default_factory=lambda: int(time.time()))
+    created: int = Field(default_factory=current_time)
     model: str
     choices: List[ChatChoice]
     usage: UsageInfo
@@ -43,7 +92,7 @@ class ChatCompletionResponse(BaseModel):
 class ModelInfo(BaseModel):
     id: str
     object: str = "model"
-    created: int = Field(default_factory=lambda: int(time.time()))
+    created: int = Field(default_factory=current_time)
     owned_by: str = "local-api"
 
 
@@ -0,0 +1,25 @@
+import os
+
+import httpx
+from langchain_core.tools import BaseTool, tool
+
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+
+
+def make_tavily_search(client: httpx.AsyncClient) -> BaseTool:
+    """构建绑定到给定连接池的搜索工具，连接池的生命周期由调用方管理"""
+
+    @tool
+    async def tavily_search(query: str) -> str:
+        """使用 Tavily 搜索网络，返回与查询最相关的几条结果（标题、链接与摘要）。"""
+        resp = await client.post(
+            TAVILY_SEARCH_URL,
+            headers={"Authorization": f"Bearer {os.environ['TAVILY_API_KEY']}"},
+            json={"query": query, "max_results": 3},
+        )
+        resp.raise_for_status()
+        return "\n\n".join(
+            f"{result['title']}\n{result['url']}\n{result['content']}" for result in resp.json()["results"]
+        )
+
+    return tavily_search
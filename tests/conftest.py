@@ -0,0 +1,23 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from izuka_llm.app import api, openai_compatable
+from izuka_llm.cache.exact import ExactCache
+
+
+class FakeEncoding:
+    """按空白切分计数，代替需要下载编码表的 tiktoken"""
+
+    def encode(self, text: str) -> list[str]:
+        return text.split()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(openai_compatable, "_encoding", FakeEncoding())
+    openai_compatable._cached_tok_len.cache_clear()
+    monkeypatch.setattr(openai_compatable, "exact_cache", ExactCache(maxsize=16))
+    monkeypatch.setattr(openai_compatable, "_semantic_cache", None)
+    # 不进入 lifespan，避免加载向量模型与下载编码表
+    yield TestClient(api.app)
+    openai_compatable._cached_tok_len.cache_clear()
@@ -0,0 +1,156 @@
+from typing import Optional
+
+import orjson
+
+from izuka_llm.app import openai_compatable
+from izuka_llm.cache.exact import ExactCache
+from izuka_llm.cache.semantic import CachedCompletion
+from izuka_llm.schemas.dto import ChatCompletionRequest
+
+
+class FakeSemanticCache:
+    """不加载向量模型的语义缓存：只要写入过同一模型、同一系统提示词的回复，之后的查询一律命中"""
+
+    def __init__(self):
+        self.store: dict[tuple[str, str], str] = {}
+        self.lookups = 0
+
+    def embed(self, text: str) -> list[float]:
+        return [1.0]
+
+    def lookup(self, embedding: list[float], model: str, system_key: str) -> Optional[CachedCompletion]:
+        self.lookups += 1
+        if (model, system_key) not in self.store:
+            return None
+        return CachedCompletion(content=self.store[model, system_key], model=model, similarity=0.99)
+
+    def insert(self, embedding: list[float], content: str, model: str, system_key: str) -> None:
+        self.store[model, system_key] = content
+
+
+def chat(client, content="what is the weather today", **kwargs):
+    payload = {"model": "gpt-4", "messages": [{"role": "user", "content": content}], **kwargs}
+    return client.post("/v1/chat/completions", json=payload)
+
+
+def read_sse(response) -> list[bytes]:
+    return [line[len(b"data: "):] for line in response.content.split(b"\n\n") if line]
+
+
+def test_list_models(client):
+    response = client.get("/v1/models")
+    assert response.status_code == 200
+    assert [m["id"] for m in response.json()["data"]] == ["gpt-3.5-turbo", "gpt-4", "custom-local-model"]
+
+
+def test_unknown_model(client):
+    response = client.post("/v1/chat/completions", json={"model": "unknown", "messages": []})
+    assert response.status_code == 400
+
+
+def test_chat_completion_usage(client):
+    body = chat(client, "one two three", temperature=0).json()
+    assert body["object"] == "chat.completion"
+    assert body["choices"][0]["message"]["content"] == "这是一个模拟回复，针对你的问题：'one two three'。"
+    assert body["usage"]["prompt_tokens"] == 3
+    assert body["usage"]["total_tokens"] == body["usage"]["prompt_tokens"] + body["usage"]["completion_tokens"]
+
+
+def test_exact_cache_hit_returns_stored_response(client):
+    first = chat(client, temperature=0)
+    second = chat(client, temperature=0)
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+
+
+def test_exact_cache_key_includes_max_tokens(client):
+    first = chat(client, temperature=0, max_tokens=16).json()
+    second = chat(client, temperature=0, max_tokens=32).json()
+    assert first["id"] != second["id"]
+
+
+def test_high_temperature_is_not_cached(client, monkeypatch):
+    semantic_cache = FakeSemanticCache()
+    monkeypatch.setattr(openai_compatable, "_semantic_cache", semantic_cache)
+
+    first = chat(client, temperature=0.7).json()
+    second = chat(client, temperature=0.7).json()
+    assert first["id"] != second["id"]
+    assert semantic_cache.lookups == 0
+
+
+def test_semantic_cache_hit_uses_current_prompt_tokens(client, monkeypatch):
+    semantic_cache = FakeSemanticCache()
+    monkeypatch.setattr(openai_compatable, "_semantic_cache", semantic_cache)
+
+    miss = chat(client, "how is the weather in tokyo today", temperature=0).json()
+    hit = chat(client, "tokyo weather", temperature=0).json()
+
+    assert hit["id"] != miss["id"]
+    assert hit["choices"][0]["message"]["content"] == miss["choices"][0]["message"]["content"]
+    assert miss["usage"]["prompt_tokens"] == 7
+    assert hit["usage"]["prompt_tokens"] == 2
+
+
+def test_semantic_cache_is_scoped_to_system_prompt(client, monkeypatch):
+    semantic_cache = FakeSemanticCache()
+    monkeypatch.setattr(openai_compatable, "_semantic_cache", semantic_cache)
+
+    def ask(system_prompt: str, question: str):
+        messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": question}]
+        payload = {"model": "gpt-4", "messages": messages, "temperature": 0}
+        return client.post("/v1/chat/completions", json=payload).json()["choices"][0]["message"]["content"]
+
+    english = ask("Answer in English.", "tokyo weather")
+    assert ask("Answer in French.", "weather in tokyo") != english
+    assert ask("Answer in English.", "weather in tokyo") == english
+
+
+def test_stream_emits_openai_chunks(client):
+    response = chat(client, "stream me a fairly long answer please", stream=True)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = read_sse(response)
+    assert events[-1] == b"[DONE]"
+    chunks = [orjson.loads(event) for event in events[:-1]]
+
+    assert len({chunk["id"] for chunk in chunks}) == 1
+    assert all(chunk["object"] == "chat.completion.chunk" for chunk in chunks)
+    assert chunks[0]["choices"][0]["delta"] == {"role": "assistant", "content": ""}
+    assert chunks[-1]["choices"][0] == {"index": 0, "delta": {}, "finish_reason": "stop"}
+
+    content_chunks = chunks[1:-1]
+    assert len(content_chunks) > 1
+    assert all(chunk["choices"][0]["finish_reason"] is None for chunk in content_chunks)
+    content = "".join(chunk["choices"][0]["delta"]["content"] for chunk in content_chunks)
+    assert content == "这是一个模拟回复，针对你的问题：'stream me a fairly long answer please'。"
+
+
+def test_stream_bypasses_exact_cache(client):
+    cached = chat(client, temperature=0)
+    streamed = chat(client, temperature=0, stream=True)
+    assert streamed.headers["content-type"].startswith("text/event-stream")
+    assert read_sse(streamed)[-1] == b"[DONE]"
+
+    # 流式请求既不读取也不写入精确匹配缓存
+    chat(client, "another question", temperature=0, stream=True)
+    request = ChatCompletionRequest(
+        model="gpt-4",
+        messages=[{"role": "user", "content": "another question"}],
+        temperature=0,
+        stream=True,
+    )
+    assert openai_compatable.exact_cache.get(ExactCache.make_key(request)) is None
+    assert chat(client, temperature=0).content == cached.content
+
+
+def test_stream_served_from_semantic_cache(client, monkeypatch):
+    semantic_cache = FakeSemanticCache()
+    monkeypatch.setattr(openai_compatable, "_semantic_cache", semantic_cache)
+
+    miss = chat(client, temperature=0).json()
+    streamed = chat(client, "something else", temperature=0, stream=True)
+    chunks = [orjson.loads(event) for event in read_sse(streamed)[:-1]]
+    content = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks)
+    assert content == miss["choices"][0]["message"]["content"]
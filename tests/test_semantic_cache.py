@@ -0,0 +1,91 @@
+import sys
+import time
+import types
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from izuka_llm.cache.semantic import SemanticCache
+from izuka_llm.schemas.dto import ChatMessage
+
+SYSTEM_KEY = SemanticCache.make_system_key([])
+
+
+class FakeSentenceTransformer:
+    """按文本查表返回固定向量，代替需要下载模型的 sentence-transformers"""
+
+    vectors = {
+        "tokyo weather": [1.0, 0.0, 0.0],
+        "weather in tokyo": [0.99, 0.1, 0.0],
+        "python tutorial": [0.0, 1.0, 0.0],
+        "cooking recipe": [0.0, 0.0, 1.0],
+    }
+
+    def __init__(self, model_name: str):
+        pass
+
+    def encode(self, text: str, normalize_embeddings: bool = True):
+        import numpy as np
+
+        vector = np.array(self.vectors[text])
+        return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def make_cache(monkeypatch):
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = FakeSentenceTransformer
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+
+    def make(max_entries: int = 100, ttl_seconds: float = 3600) -> SemanticCache:
+        # 每个用例使用独立的 collection，避免进程内共享的 chroma 客户端相互影响
+        return SemanticCache(
+            "fake", threshold=0.92, max_entries=max_entries, ttl_seconds=ttl_seconds,
+            collection_name=f"test_{time.time_ns()}",
+        )
+
+    return make
+
+
+def test_lookup_respects_threshold_and_model(make_cache):
+    cache = make_cache()
+    assert cache.lookup(cache.embed("tokyo weather"), "gpt-4", SYSTEM_KEY) is None
+
+    cache.insert(cache.embed("tokyo weather"), "sunny", "gpt-4", SYSTEM_KEY)
+    hit = cache.lookup(cache.embed("weather in tokyo"), "gpt-4", SYSTEM_KEY)
+    assert hit is not None and hit.content == "sunny" and hit.similarity >= 0.92
+
+    assert cache.lookup(cache.embed("python tutorial"), "gpt-4", SYSTEM_KEY) is None
+    assert cache.lookup(cache.embed("tokyo weather"), "gpt-3.5-turbo", SYSTEM_KEY) is None
+
+
+def test_lookup_is_scoped_to_system_prompt(make_cache):
+    cache = make_cache()
+    english = SemanticCache.make_system_key([ChatMessage(role="system", content="Answer in English.")])
+    french = SemanticCache.make_system_key([ChatMessage(role="system", content="Answer in French.")])
+    assert english != french
+
+    cache.insert(cache.embed("tokyo weather"), "sunny", "gpt-4", english)
+    assert cache.lookup(cache.embed("tokyo weather"), "gpt-4", french) is None
+    assert cache.lookup(cache.embed("tokyo weather"), "gpt-4", english).content == "sunny"
+
+
+def test_insert_evicts_oldest_beyond_max_entries(make_cache):
+    cache = make_cache(max_entries=2)
+    for text in ("tokyo weather", "python tutorial", "cooking recipe"):
+        cache.insert(cache.embed(text), text, "gpt-4", SYSTEM_KEY)
+
+    assert cache._collection.count() == 2
+    assert cache.lookup(cache.embed("tokyo weather"), "gpt-4", SYSTEM_KEY) is None
+    assert cache.lookup(cache.embed("cooking recipe"), "gpt-4", SYSTEM_KEY).content == "cooking recipe"
+
+
+def test_expired_entries_miss_and_are_evicted(make_cache):
+    cache = make_cache(ttl_seconds=0.05)
+    cache.insert(cache.embed("tokyo weather"), "sunny", "gpt-4", SYSTEM_KEY)
+    time.sleep(0.1)
+
+    assert cache.lookup(cache.embed("tokyo weather"), "gpt-4", SYSTEM_KEY) is None
+    cache.insert(cache.embed("python tutorial"), "docs", "gpt-4", SYSTEM_KEY)
+    assert cache._collection.count() == 1